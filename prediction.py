@@ -1,142 +1,205 @@
 import fastf1
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+from numba import njit
 from datetime import datetime
-import warnings
-warnings.filterwarnings('ignore')
+
+pd.set_option('mode.copy_on_write', True)
 
 fastf1.Cache.enable_cache('cache')
 
-def get_session_data(year, gp_name, session_name):
+@functools.lru_cache(maxsize=32)
+def _get_session(year, gp_name, session_name, laps=True):
     """
-    Get lap times and telemetry data for a specific session
+    Get a session and load it once per (year, gp, session) within the process
     """
-    try:
-        session = fastf1.get_session(year, gp_name, session_name)
-        session.load()
+    session = fastf1.get_session(year, gp_name, session_name)
+    session.load(laps=laps, telemetry=False, weather=False, messages=False)
+    return session
+
+def _td_to_sec(s):
+    """
+    Convert a timedelta Series to float seconds in one int64 pass (NaT -> NaN)
+    """
+    seconds = s.values.astype('timedelta64[ns]').astype('int64') / 1e9
+    seconds[pd.isna(s.values)] = np.nan
+    return seconds
+
+@functools.lru_cache(maxsize=8)
+def _cached_schedule(year):
+    """
+    Get the event schedule once per year within the process
+    """
+    return fastf1.get_event_schedule(year)
+
+def _aggregate_laps_polars(valid_laps):
+    """
+    Per-driver min/mean/std/count over the int64 lap nanoseconds via Polars
+    """
+    return (
+        pl.DataFrame({
+            'Driver': valid_laps['Driver'].values,
+            'LapNs': valid_laps['LapTime'].values.view('int64')
+        })
+        .lazy()
+        .group_by('Driver', maintain_order=True)
+        .agg(
+            pl.col('LapNs').min().alias('FastestLap'),
+            pl.col('LapNs').mean().alias('AverageLap'),
+            pl.col('LapNs').std().alias('Consistency'),
+            pl.len().cast(pl.Int64).alias('TotalLaps')
+        )
+        .with_columns(
+            pl.col('FastestLap') / 1e9,
+            pl.col('AverageLap') / 1e9,
+            pl.col('Consistency') / 1e9
+        )
+        .collect()
+        .to_pandas()
+    )
+
+def _aggregate_laps_npg(valid_laps):
+    """
+    numpy-groupies fallback for the same aggregation when Polars is missing
+    """
+    import numpy_groupies as npg
+
+    codes, drivers = pd.factorize(valid_laps['Driver'].values, sort=False)
+    lap_sec = valid_laps['LapTime'].values.view('int64') / 1e9
+    counts = np.bincount(codes)
+
+    consistency = npg.aggregate(codes, lap_sec, func='std', ddof=1)
+    consistency[counts < 2] = np.nan
 
+    return pd.DataFrame({
+        'Driver': drivers,
+        'FastestLap': npg.aggregate(codes, lap_sec, func='min'),
+        'AverageLap': npg.aggregate(codes, lap_sec, func='mean'),
+        'Consistency': consistency,
+        'TotalLaps': counts
+    })
+
+_aggregate_laps = _aggregate_laps_polars if pl is not None else _aggregate_laps_npg
+
+def _session_to_driver_df(session, session_name):
+    """
+    Aggregate per-driver lap stats from an already-loaded session
+    """
+    try:
         lap_times = session.laps
 
-        valid_laps = lap_times[lap_times['LapTime'].notna()]
+        valid_laps = lap_times.loc[lap_times['LapTime'].notna(), ['Driver', 'LapTime']]
 
-        driver_data = []
-        
-        for driver in valid_laps['Driver'].unique():
-            driver_laps = valid_laps[valid_laps['Driver'] == driver]
-            
-            if len(driver_laps) > 0:
-                fastest_lap = driver_laps['LapTime'].min()
-                avg_lap = driver_laps['LapTime'].mean()
-                consistency = driver_laps['LapTime'].std()
-                total_laps = len(driver_laps)
-                
-                driver_data.append({
-                    'Driver': driver,
-                    'FastestLap': fastest_lap.total_seconds() if pd.notna(fastest_lap) else None,
-                    'AverageLap': avg_lap.total_seconds() if pd.notna(avg_lap) else None,
-                    'Consistency': consistency.total_seconds() if pd.notna(consistency) else None,
-                    'TotalLaps': total_laps,
-                    'Session': session_name
-                })
-        
-        return pd.DataFrame(driver_data)
-    
+        driver_data = _aggregate_laps(valid_laps)
+
+        float_cols = ['FastestLap', 'AverageLap', 'Consistency']
+        driver_data[float_cols] = driver_data[float_cols].astype('float32')
+        driver_data['Driver'] = driver_data['Driver'].astype('category')
+        driver_data['Session'] = session_name
+
+        return driver_data
+
+    except Exception as e:
+        print(f"Error loading {session_name}: {e}")
+        return pd.DataFrame()
+
+def get_session_data(year, gp_name, session_name):
+    """
+    Get lap times and telemetry data for a specific session
+    """
+    try:
+        session = _get_session(year, gp_name, session_name)
     except Exception as e:
         print(f"Error loading {session_name}: {e}")
         return pd.DataFrame()
 
+    return _session_to_driver_df(session, session_name)
+
 def get_qualifying_positions(year, gp_name):
     """
     Get qualifying positions and times
     """
     try:
-        qualifying = fastf1.get_session(year, gp_name, 'Q')
-        qualifying.load()
+        qualifying = _get_session(year, gp_name, 'Q', laps=False)
 
         results = qualifying.results
-        
-        qual_data = []
-        for _, row in results.iterrows():
-            qual_data.append({
-                'Driver': row['Abbreviation'],
-                'QualifyingPosition': row['Position'],
-                'Q1Time': row['Q1'].total_seconds() if pd.notna(row['Q1']) else None,
-                'Q2Time': row['Q2'].total_seconds() if pd.notna(row['Q2']) else None,
-                'Q3Time': row['Q3'].total_seconds() if pd.notna(row['Q3']) else None,
-            })
-        
-        return pd.DataFrame(qual_data)
+
+        qual_data = pd.DataFrame({
+            'Driver': results['Abbreviation'].values,
+            'QualifyingPosition': results['Position'].values,
+            'Q1Time': _td_to_sec(results['Q1']),
+            'Q2Time': _td_to_sec(results['Q2']),
+            'Q3Time': _td_to_sec(results['Q3']),
+        })
+        qual_data['Driver'] = qual_data['Driver'].astype('category')
+        qual_data['QualifyingPosition'] = qual_data['QualifyingPosition'].astype('Int8')
+        time_cols = ['Q1Time', 'Q2Time', 'Q3Time']
+        qual_data[time_cols] = qual_data[time_cols].astype('float32')
+
+        return qual_data
     
     except Exception as e:
         print(f"Error loading qualifying: {e}")
         return pd.DataFrame()
 
-def calculate_prediction_score(practice_data, qualifying_data):
+@njit(cache=True)
+def _score(avg_fast, fastest_overall, consistency, total_laps, qual_pos):
     """
-    Calculate prediction score based on practice sessions and qualifying
+    Fused scoring kernel over the per-driver arrays
     """
-    all_practice = pd.concat(practice_data, ignore_index=True)
+    lap_time_score = (avg_fast - fastest_overall) * 1000.0
+    consistency_score = np.where(consistency != 0.0, consistency * 100.0, 500.0)
+    reliability_score = np.minimum(total_laps / 50.0, 1.0)
+    practice_score = lap_time_score + consistency_score - (reliability_score * 100.0)
+    return (qual_pos * 0.6) + (practice_score * 0.004), practice_score
 
-    driver_scores = {}
-    
-    for driver in all_practice['Driver'].unique():
-        driver_practice = all_practice[all_practice['Driver'] == driver]
-        session_weights = {'FP1': 0.15, 'FP2': 0.25, 'FP3': 0.35, 'Sprint': 0.25}
+def calculate_prediction_score(all_practice, qualifying_data):
+    """
+    Calculate prediction score based on the concatenated practice sessions and qualifying
+    """
+    all_practice['Driver'] = all_practice['Driver'].astype('category')
 
-        fastest_laps = []
-        weights = []
-        
-        for _, row in driver_practice.iterrows():
-            if pd.notna(row['FastestLap']):
-                fastest_laps.append(row['FastestLap'])
-                weights.append(session_weights.get(row['Session'], 0.2))
-        
-        if fastest_laps:
-            avg_fastest = np.average(fastest_laps, weights=weights)
+    session_weights = {'FP1': 0.15, 'FP2': 0.25, 'FP3': 0.35, 'Sprint': 0.25}
+    weights = all_practice['Session'].map(session_weights).fillna(0.2).to_numpy()
+    fastest = all_practice['FastestLap'].to_numpy()
+    weights = np.where(np.isnan(fastest), 0.0, weights)
+    all_practice['Weight'] = weights
+    all_practice['WeightedFastest'] = weights * fastest
 
-            consistency_scores = [row['Consistency'] for _, row in driver_practice.iterrows() if pd.notna(row['Consistency'])]
-            avg_consistency = np.mean(consistency_scores) if consistency_scores else 10.0
+    driver_scores = all_practice.groupby('Driver', sort=False, observed=True).agg(
+        WeightedSum=('WeightedFastest', 'sum'),
+        WeightSum=('Weight', 'sum'),
+        Consistency=('Consistency', 'mean'),
+        TotalLaps=('TotalLaps', 'sum')
+    )
+    driver_scores = driver_scores[driver_scores['WeightSum'] > 0]
+    driver_scores['AvgFastestLap'] = driver_scores['WeightedSum'] / driver_scores['WeightSum']
+    driver_scores['Consistency'] = driver_scores['Consistency'].fillna(10.0)
 
-            total_laps = driver_practice['TotalLaps'].sum()
-            
-            driver_scores[driver] = {
-                'AvgFastestLap': avg_fastest,
-                'Consistency': avg_consistency,
-                'TotalLaps': total_laps,
-                'PracticeScore': 0
-            }
-    
-    if driver_scores:
-        fastest_overall = min([data['AvgFastestLap'] for data in driver_scores.values()])
-        
-        for driver, data in driver_scores.items():
-            lap_time_score = (data['AvgFastestLap'] - fastest_overall) * 1000 
+    scores_df = driver_scores.reset_index()[['Driver', 'AvgFastestLap', 'Consistency', 'TotalLaps']]
 
-            consistency_score = data['Consistency'] * 100 if data['Consistency'] else 500
-            reliability_score = min(data['TotalLaps'] / 50, 1.0) 
-            data['PracticeScore'] = lap_time_score + consistency_score - (reliability_score * 100)
+    final_scores = qualifying_data[['Driver', 'QualifyingPosition']].merge(scores_df, on='Driver', how='inner')
 
-    final_scores = []
-    
-    for _, qual_row in qualifying_data.iterrows():
-        driver = qual_row['Driver']
-        
-        if driver in driver_scores:
-            practice_score = driver_scores[driver]['PracticeScore']
-            qualifying_pos = qual_row['QualifyingPosition']
+    final_score, practice_score = _score(
+        final_scores['AvgFastestLap'].to_numpy(),
+        driver_scores['AvgFastestLap'].min(),
+        final_scores['Consistency'].to_numpy(),
+        final_scores['TotalLaps'].to_numpy(dtype='float64'),
+        final_scores['QualifyingPosition'].to_numpy(dtype='float64', na_value=np.nan)
+    )
+    final_scores['PracticeScore'] = practice_score.astype('float32')
+    final_scores['FinalScore'] = final_score.astype('float32')
 
-            final_score = (qualifying_pos * 0.6) + (practice_score * 0.4 / 100)
-            
-            final_scores.append({
-                'Driver': driver,
-                'QualifyingPosition': qualifying_pos,
-                'PracticeScore': practice_score,
-                'FinalScore': final_score,
-                'AvgFastestLap': driver_scores[driver]['AvgFastestLap'],
-                'Consistency': driver_scores[driver]['Consistency']
-            })
-    
-    return pd.DataFrame(final_scores).sort_values('FinalScore')
+    final_scores = final_scores[['Driver', 'QualifyingPosition', 'PracticeScore', 'FinalScore', 'AvgFastestLap', 'Consistency']]
+
+    return final_scores.sort_values('FinalScore')
 
 def predict_race_winner():
     """
@@ -150,23 +213,29 @@ def predict_race_winner():
     
     print(f"Analyzing data for British GP {year}...")
 
-    gp_name = None
-    for name in possible_gp_names:
+    try:
+        event_names = set(_cached_schedule(year)['EventName'])
+    except Exception as e:
+        print(f"Could not retrieve {year} schedule: {e}")
+        event_names = set()
+
+    gp_name = next((name for name in possible_gp_names if name in event_names), None)
+    probed_session = None
+
+    if gp_name:
         try:
-            test_session = fastf1.get_session(year, name, 'FP1')
-            gp_name = name
-            print(f"Found GP data using name: '{name}'")
-            break
+            probed_session = _get_session(year, gp_name, 'FP1')
+            print(f"Found GP data using name: '{gp_name}'")
         except Exception as e:
-            print(f"❌ '{name}' not found: {str(e)[:100]}...")
-            continue
-    
+            print(f"❌ '{gp_name}' could not be loaded: {str(e)[:100]}...")
+            gp_name = None
+
     if not gp_name:
         print("Could not find British GP 2025 data.")
         print("Available GPs for 2025 might be:")
 
         try:
-            schedule = fastf1.get_event_schedule(year)
+            schedule = _cached_schedule(year)
             print(schedule[['EventName', 'Location', 'EventDate']].to_string())
         except:
             print("Could not retrieve 2025 schedule")
@@ -175,20 +244,25 @@ def predict_race_winner():
     print(f"\nLoading session data for {gp_name}...")
  
     practice_sessions = ['FP1', 'FP2', 'FP3']
+
+    print(f"Loading {', '.join(practice_sessions)} and Qualifying...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {'FP1': executor.submit(_session_to_driver_df, probed_session, 'FP1')}
+        for session in practice_sessions[1:]:
+            futures[session] = executor.submit(get_session_data, year, gp_name, session)
+        futures['Q'] = executor.submit(get_qualifying_positions, year, gp_name)
+
     practice_data = []
-    
     for session in practice_sessions:
-        print(f"Loading {session}...")
-        data = get_session_data(year, gp_name, session)
+        data = futures[session].result()
         if not data.empty:
             practice_data.append(data)
             print(f"{session}: {len(data)} drivers loaded")
         else:
             print(f"No data available for {session}")
 
-    print("Loading Qualifying...")
-    qualifying_data = get_qualifying_positions(year, gp_name)
-    
+    qualifying_data = futures['Q'].result()
+
     if not qualifying_data.empty:
         print(f"Qualifying: {len(qualifying_data)} drivers loaded")
     else:
@@ -199,7 +273,8 @@ def predict_race_winner():
         return None
 
     print("\n🔍 Analyzing performance data...")
-    predictions = calculate_prediction_score(practice_data, qualifying_data)
+    all_practice = pd.concat(practice_data, ignore_index=True, copy=False)
+    predictions = calculate_prediction_score(all_practice, qualifying_data)
     
     if predictions.empty:
         print("Unable to generate predictions")
@@ -208,17 +283,21 @@ def predict_race_winner():
     print("\n🏆 RACE WINNER PREDICTIONS")
     print("=" * 50)
     
-    top_10 = predictions.head(10)
-    
-    for i, (_, row) in enumerate(top_10.iterrows(), 1):
-        fastest_lap_str = f"{row['AvgFastestLap']:.3f}s" if pd.notna(row['AvgFastestLap']) else "N/A"
-        consistency_str = f"{row['Consistency']:.3f}s" if pd.notna(row['Consistency']) else "N/A"
-        
-        print(f"{i:2d}. {row['Driver']:3s} | "
-              f"Qual: P{row['QualifyingPosition']:2.0f} | "
-              f"Avg Fast Lap: {fastest_lap_str} | "
-              f"Consistency: ±{consistency_str} | "
-              f"Score: {row['FinalScore']:.2f}")
+    top_10 = predictions.head(10).assign(Rank=lambda d: np.arange(1, len(d) + 1))
+
+    def _fmt_seconds(x):
+        return f"{x:.3f}s" if pd.notna(x) else "N/A"
+
+    print(top_10.to_string(
+        columns=['Rank', 'Driver', 'QualifyingPosition', 'AvgFastestLap', 'Consistency', 'FinalScore'],
+        formatters={
+            'QualifyingPosition': lambda x: f"P{x:.0f}" if pd.notna(x) else "N/A",
+            'AvgFastestLap': _fmt_seconds,
+            'Consistency': lambda x: f"±{_fmt_seconds(x)}",
+            'FinalScore': lambda x: f"{x:.2f}"
+        },
+        index=False
+    ))
 
     winner = predictions.iloc[0]
     print(f"\nPREDICTED WINNER: {winner['Driver']}")
@@ -244,7 +323,7 @@ if __name__ == "__main__":
     try:
         print("🔍 Checking available F1 races for 2025...")
         try:
-            schedule = fastf1.get_event_schedule(2025)
+            schedule = _cached_schedule(2025)
             print("\nAvailable F1 races for 2025:")
             print(schedule[['EventName', 'Location', 'EventDate']].head(10).to_string())
             print("\n" + "="*50)
@@ -271,13 +350,14 @@ if __name__ == "__main__":
             qualifying_data = get_qualifying_positions(year, gp_name)
             
             if practice_data and not qualifying_data.empty:
-                predictions = calculate_prediction_score(practice_data, qualifying_data)
+                all_practice = pd.concat(practice_data, ignore_index=True, copy=False)
+                predictions = calculate_prediction_score(all_practice, qualifying_data)
                 print("\n🏆 2024 BRITISH GP ANALYSIS (for reference)")
                 print("=" * 50)
                 
                 top_5 = predictions.head(5)
-                for i, (_, row) in enumerate(top_5.iterrows(), 1):
-                    print(f"{i}. {row['Driver']} - Score: {row['FinalScore']:.2f}")
+                for i, (driver, score) in enumerate(zip(top_5['Driver'], top_5['FinalScore']), 1):
+                    print(f"{i}. {driver} - Score: {score:.2f}")
                     
     except Exception as e:
         print(f"Error: {e}")